@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import timeit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import event_validator
+
+RUNS = 20
+ITERATIONS = 1000
+
+EVENT = {
+    "eid": "3e628a05-7a4a-4bf3-8770-084c11601a12",
+    "documentNumber": "42323235600",
+    "name": "Joseph",
+    "age": 32,
+    "address": {
+        "street": "St. Blue",
+        "number": 3,
+        "mailAddress": True
+    }
+}
+
+# Simulation of the module before the change: boto3 is imported together with the module, and the first event goes
+# through the handler of the current module. It isn't the original module, which also parsed schema.json on every event
+EAGER = """
+import json, time
+start = time.perf_counter()
+import boto3
+import event_validator
+imported = time.perf_counter()
+event_validator.handler(json.loads({event!r}))
+first_event = time.perf_counter()
+event_validator.handler(json.loads({event!r}))
+second_event = time.perf_counter()
+print(json.dumps([imported - start, first_event - imported, second_event - first_event]))
+"""
+
+# Current module: boto3 is imported and the SQS client is created by send_event_to_queue when the first valid event is
+# sent, so the first event pays the deferred import
+LAZY = """
+import json, time
+start = time.perf_counter()
+import event_validator
+imported = time.perf_counter()
+event_validator.handler(json.loads({event!r}))
+first_event = time.perf_counter()
+event_validator.handler(json.loads({event!r}))
+second_event = time.perf_counter()
+print(json.dumps([imported - start, first_event - imported, second_event - first_event]))
+"""
+
+
+class SQSStub(BaseHTTPRequestHandler):
+    """Local SQS endpoint, answering GetQueueUrl and SendMessage of the JSON protocol, so events are really sent
+    without AWS credentials or moto, whose import would be measured too.
+    """
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.headers["X-Amz-Target"].endswith("GetQueueUrl"):
+            response = {"QueueUrl": f"http://{self.headers['Host']}/000000000000/{body['QueueName']}"}
+        else:
+            response = {"MessageId": "00000000-0000-0000-0000-000000000000",
+                        "MD5OfMessageBody": hashlib.md5(body["MessageBody"].encode()).hexdigest()}
+        content = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-amz-json-1.0")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(code, runs, env):
+    '''
+    Executa o código em um novo interpretador a cada rodada, para medir sempre um cold start
+    :param code: Código que imprime o tempo de import, do primeiro e do segundo evento (str)
+    :param runs: Quantidade de rodadas (int)
+    :param env: Variáveis de ambiente do interpretador, com o endpoint do SQS (dict)
+    :return: Mediana do tempo de import, do primeiro e do segundo evento, em ms (tuple)
+    '''
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+        lines = output.stdout.splitlines()
+        # handler prints the errors instead of raising them, so each event must have been sent
+        if lines[:-1] != ["Response status code: [200]"] * 2:
+            raise RuntimeError(f"Events weren't sent: {output.stdout}")
+        timings.append(json.loads(lines[-1]))
+    return tuple(statistics.median(timing[i] for timing in timings) * 1000 for i in range(3))
+
+
+def measure_in_process(function, iterations):
+    '''
+    Executa a função várias vezes no mesmo processo, isolando o seu custo do custo de import
+    :param function: Função medida (callable)
+    :param iterations: Quantidade de execuções (int)
+    :return: Tempo médio por execução, em µs (float)
+    '''
+    return timeit.timeit(function, number=iterations) / iterations * 1000000
+
+
+def main(runs):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SQSStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = {**os.environ, "AWS_ENDPOINT_URL_SQS": f"http://127.0.0.1:{server.server_port}",
+           "AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test"}
+    print(f"{'mode':<18}{'import (ms)':>14}{'first event (ms)':>20}{'second event (ms)':>20}{'total (ms)':>14}")
+    for mode, code in (("eager (simulated)", EAGER), ("lazy", LAZY)):
+        import_time, first_event, second_event = measure(code.format(event=json.dumps(EVENT)), runs, env)
+        print(f"{mode:<18}{import_time:>14.2f}{first_event:>20.2f}{second_event:>20.2f}"
+              f"{import_time + first_event:>14.2f}")
+    server.shutdown()
+
+    validator = event_validator.load_validator("schema.json")
+    print(f"\n{'step':<32}{'time (µs)':>12}")
+    print(f"{'parse and compile schema.json':<32}"
+          f"{measure_in_process(lambda: event_validator.load_validator('schema.json'), ITERATIONS):>12.1f}")
+    print(f"{'validate event':<32}{measure_in_process(lambda: validator.valid_object(EVENT), ITERATIONS):>12.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else RUNS)
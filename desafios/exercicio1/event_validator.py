@@ -1,7 +1,9 @@
 import json
-import boto3
+from urllib.parse import urljoin
 
 _SQS_CLIENT = None
+# validator compiled on the first event, and used by every event handled by the same process
+_VALIDATOR = None
 
 
 def send_event_to_queue(event, queue_name):
@@ -11,8 +13,12 @@ def send_event_to_queue(event, queue_name):
     :param queue_name: Nome da fila (str)
     :return: None
     '''
-    
-    sqs_client = boto3.client("sqs", region_name="us-east-1")
+    global _SQS_CLIENT
+    if _SQS_CLIENT is None:
+        # boto3 takes most of the import time, so it is only imported when the first event is sent
+        import boto3
+        _SQS_CLIENT = boto3.client("sqs", region_name="us-east-1")
+    sqs_client = _SQS_CLIENT
     response = sqs_client.get_queue_url(
         QueueName=queue_name
     )
@@ -32,20 +38,157 @@ def handler(event):
     Utilize a função send_event_to_queue para envio do evento para a fila,
         não é necessário alterá-la
     '''
-    file = open("schema.json")
-    schema = json.load(file)
-    validator = EventsValidator(schema['required'], schema['properties'])
+    global _VALIDATOR
+    if _VALIDATOR is None:
+        _VALIDATOR = load_validator("schema.json")
     try:
-        if validator.valid_object(event):
+        if _VALIDATOR.valid_object(event):
             send_event_to_queue(event, 'valid-events-queue')
     except Exception as e:
         print(e)
 
 
+def load_validator(schema_path: str) -> "EventsValidator":
+    """Load the validator of an schema file, compiling all its sub validators at once.
+        :param schema_path: string with path of JSON schema file
+        :return: EventsValidator of the schema
+    """
+    with open(schema_path) as file:
+        schema = json.load(file)
+    return EventsValidator.from_schema(schema).compile()
+
+
+class SchemaResolver:
+    def __init__(self, document: dict, registry: dict = None, uri: str = None, shared: dict = None):
+        self.document = document
+        self.registry = registry or {}
+        self.uri = document.get("$id", "").split("#")[0] if uri is None else uri
+        # state shared by the resolvers of every document, so each document and each allOf is only processed once
+        self.shared = shared if shared is not None else {"documents": {}, "flattened": {}}
+        self.shared["documents"][self.uri] = self
+
+    def _document_key(self, uri: str) -> str:
+        """Find the key of a referenced document. The uri is looked up as it is written in the $ref, then relative to
+        current document uri, and finally against the $id declared by the registered schemas. If no document is found,
+        an Value Error Exception is raised indicating which are the registered schemas.
+            :param uri: string with the document part of an $ref
+            :return: string with the key of the document on registry
+        """
+        if not uri or uri == self.uri:
+            return self.uri
+        candidates = (uri, urljoin(self.uri, uri))
+        for candidate in candidates:
+            if candidate in self.shared["documents"] or candidate in self.registry:
+                return candidate
+        for key, document in self.registry.items():
+            if document.get("$id", "").split("#")[0] in candidates:
+                return key
+        raise ValueError(f"Referenced schema '{uri}' is not registered. Registered schemas are: {list(self.registry)}")
+
+    def _for_document(self, uri: str) -> "SchemaResolver":
+        """Return the resolver of a referenced document, creating it on the first time the document is referenced.
+            :param uri: string with the document part of an $ref
+            :return: SchemaResolver of the referenced document
+        """
+        key = self._document_key(uri)
+        if key not in self.shared["documents"]:
+            SchemaResolver(self.registry[key], self.registry, key, self.shared)
+        return self.shared["documents"][key]
+
+    def _pointer(self, pointer: str):
+        """Walk through current document following an JSON pointer, like '/definitions/address'.
+            :param pointer: string with the fragment part of an $ref
+            :return: sub schema pointed
+        """
+        node = self.document
+        for part in filter(None, pointer.split("/")):
+            part = part.replace("~1", "/").replace("~0", "~")
+            try:
+                node = node[int(part)] if isinstance(node, list) else node[part]
+            except (KeyError, IndexError, ValueError):
+                raise ValueError(f"Could not resolve '#{pointer}' in schema '{self.uri}'")
+        return node
+
+    def resolve(self, schema: dict) -> tuple:
+        """Follow $ref of schema until an schema without $ref is found. Each ref visited is kept, so if the same ref is
+        visited twice, an Value Error Exception is raised indicating the cycle found.
+            :param schema: dict with the schema that will be resolved
+            :return: tuple with the resolved schema, the resolver of the document where it was found and the ref key
+                that identifies it (None when schema isn't an $ref)
+        """
+        resolver, key, visited = self, None, []
+        while "$ref" in schema:
+            uri, _, pointer = schema["$ref"].partition("#")
+            resolver = resolver._for_document(uri)
+            key = f"{resolver.uri}#{pointer}"
+            if key in visited:
+                raise ValueError(f"Circular $ref found: {' -> '.join(visited + [key])}")
+            visited.append(key)
+            schema = resolver._pointer(pointer)
+        return schema, resolver, key
+
+    def _absolute(self, schema):
+        """Copy an schema of current document replacing its $ref by refs that can be resolved from any document.
+            :param schema: schema (or part of it) that will be copied
+            :return: copy of schema with absolute refs
+        """
+        if isinstance(schema, list):
+            return [self._absolute(item) for item in schema]
+        if not isinstance(schema, dict):
+            return schema
+        copy = {key: self._absolute(value) for key, value in schema.items()}
+        if isinstance(schema.get("$ref"), str):
+            uri, _, pointer = schema["$ref"].partition("#")
+            copy["$ref"] = f"{self._document_key(uri)}#{pointer}"
+        return copy
+
+    def flatten(self, schema: dict, key: str) -> dict:
+        """Merge allOf sub schemas into a single schema. Properties are merged, and a property declared by more than one
+        sub schema must match all of them, required fields are joined and the other keywords of later sub schemas
+        override the earlier ones. If sub schemas declare different types, an Value Error Exception is raised.
+        The merged schema is kept by key, together with the schema it came from, so each allOf is merged only once.
+            :param schema: dict with the schema (already resolved) that will be flattened
+            :param key: string with the ref key or path that identifies the schema
+            :return: dict with schema without allOf
+        """
+        if "allOf" not in schema:
+            return schema
+        cached = self.shared["flattened"].get(key)
+        if cached is None or cached[0] is not schema:
+            merged = {name: value for name, value in schema.items() if name != "allOf"}
+            for index, sub_schema in enumerate(schema["allOf"]):
+                sub_schema, resolver, sub_key = self.resolve(sub_schema)
+                sub_schema = resolver.flatten(sub_schema, sub_key or f"{key}/allOf/{index}")
+                if resolver is not self:
+                    sub_schema = resolver._absolute(sub_schema)
+                if "type" in merged and "type" in sub_schema and merged["type"] != sub_schema["type"]:
+                    raise ValueError(f"allOf mixes types '{merged['type']}' and '{sub_schema['type']}'")
+                for name, value in sub_schema.items():
+                    if name == "properties":
+                        properties = dict(merged.get("properties", {}))
+                        for prop_name, prop in value.items():
+                            if prop_name in properties and properties[prop_name] != prop:
+                                prop = {"allOf": [properties[prop_name], prop]}
+                            properties[prop_name] = prop
+                        merged["properties"] = properties
+                    elif name == "required":
+                        merged["required"] = list(dict.fromkeys(merged.get("required", []) + value))
+                    else:
+                        merged[name] = value
+            self.shared["flattened"][key] = (schema, merged)
+        return self.shared["flattened"][key][1]
+
+
 class EventsValidator:
-    def __init__(self, required: list, schema_obj: dict):
+    def __init__(self, required: list, schema_obj: dict, resolver: SchemaResolver = None, compiled: dict = None,
+                 path: str = None):
         self.schema_obj = schema_obj
         self.object_required = required
+        self.resolver = resolver or SchemaResolver({"required": required, "properties": schema_obj})
+        # ref key or path of the object schema, used to identify its sub schemas
+        self.path = path or f"{self.resolver.uri}#"
+        # sub validators and discriminators, shared with every nested validator so each sub schema is compiled once
+        self.compiled = compiled if compiled is not None else {}
         # dict structure created to translate schema types to python types
         self.data_types = {
             "string": str,
@@ -57,6 +200,20 @@ class EventsValidator:
             "float": float
         }
 
+    @classmethod
+    def from_schema(cls, schema: dict, registry: dict = None) -> "EventsValidator":
+        """Create validator from an complete JSON schema, resolving $ref and allOf of the root schema.
+            :param schema: dict with the JSON schema
+            :param registry: dict with other schemas that can be referenced, keyed by their uri
+            :return: EventsValidator of the schema
+        """
+        schema, resolver, key = SchemaResolver(schema, registry).resolve(schema)
+        key = key or f"{resolver.uri}#"
+        schema = resolver.flatten(schema, key)
+        validator = cls(schema.get("required", []), schema.get("properties", {}), resolver, path=key)
+        validator.compiled[("object", key)] = validator
+        return validator
+
     def _has_required(self, event: dict) -> bool:
         """Checks if event has all required fields listed on object_required by doing an subset of object_required
         with event keys. If it doesnt have all required fields, an Value Error Exception is raised indicating which are
@@ -101,6 +258,177 @@ class EventsValidator:
                             f" received {type(field_value)}")
         return True
 
+    def _sub_validator(self, schema: dict, resolver: SchemaResolver, key: str) -> "EventsValidator":
+        """Return the validator of an object schema. Validators are kept by key, so an schema referenced in many places
+        is compiled only once, and recursive schemas reuse the validator that is being used.
+            :param schema: dict with the object schema (already resolved and flattened)
+            :param resolver: SchemaResolver of the document where schema was found
+            :param key: string with the ref key or path that identifies the schema
+            :return: EventsValidator of the schema
+        """
+        if ("object", key) not in self.compiled:
+            self.compiled[("object", key)] = EventsValidator(schema.get("required", []), schema.get("properties", {}),
+                                                             resolver, self.compiled, key)
+        return self.compiled[("object", key)]
+
+    def _discriminator_branches(self, schema: dict, resolver: SchemaResolver, key: str) -> dict:
+        """Return the map between discriminator values and oneOf sub schemas, with their paths. The map is built once,
+        using discriminator mapping, or the const/enum declared in each sub schema.
+            :param schema: dict with the oneOf schema
+            :param resolver: SchemaResolver of the document where schema was found
+            :param key: string with the ref key or path that identifies the schema
+            :return: dict with tuples of sub schema and its path, keyed by discriminator value
+        """
+        if ("discriminator", key) not in self.compiled:
+            discriminator = schema["discriminator"]
+            branches = {value: ({"$ref": ref}, f"{key}/discriminator/mapping/{value}")
+                        for value, ref in discriminator.get("mapping", {}).items()}
+            for index, sub_schema in enumerate(schema["oneOf"]):
+                resolved, sub_resolver, sub_key = resolver.resolve(sub_schema)
+                sub_key = sub_key or f"{key}/oneOf/{index}"
+                properties = sub_resolver.flatten(resolved, sub_key).get("properties", {})
+                prop, prop_resolver, prop_key = sub_resolver.resolve(properties.get(discriminator["propertyName"], {}))
+                prop = prop_resolver.flatten(prop, prop_key or f"{sub_key}/properties/{discriminator['propertyName']}")
+                for value in prop.get("enum", [prop["const"]] if "const" in prop else []):
+                    branches.setdefault(value, (sub_schema, f"{key}/oneOf/{index}"))
+            self.compiled[("discriminator", key)] = branches
+        return self.compiled[("discriminator", key)]
+
+    def _discriminated(self, schema: dict, resolver: SchemaResolver, key: str, field_name: str, field_value) -> tuple:
+        """Choose the oneOf sub schema by the discriminator field declared. If event doesnt have an known discriminator
+        value, an Value Error Exception is raised.
+            :param schema: dict with the oneOf schema
+            :param resolver: SchemaResolver of the document where schema was found
+            :param key: string with the ref key or path that identifies the schema
+            :param field_name: string with the field name that will be validated
+            :param field_value: value that came in event for current field that is being validated
+            :return: tuple with the sub schema chosen and its path
+        """
+        property_name = schema["discriminator"]["propertyName"]
+        branches = self._discriminator_branches(schema, resolver, key)
+        if not isinstance(field_value, dict) or field_value.get(property_name) not in branches:
+            raise ValueError(f"Field '{field_name}' must have '{property_name}' with one of {list(branches)}")
+        return branches[field_value[property_name]]
+
+    def _one_of(self, schema: dict, resolver: SchemaResolver, key: str, field_name: str, field_value) -> bool:
+        """Checks if value is valid for exactly one of oneOf sub schemas. If a discriminator is declared, only the sub
+        schema that it points is validated, else, validation stops as soon as a second sub schema matches.
+        If none or more than one sub schema matches, an Value Error Exception is raised.
+            :param schema: dict with the oneOf schema
+            :param resolver: SchemaResolver of the document where schema was found
+            :param key: string with the ref key or path that identifies the schema
+            :param field_name: string with the field name that will be validated
+            :param field_value: value that came in event for current field that is being validated
+            :return: boolean indicating if value matches one sub schema
+        """
+        if "discriminator" in schema:
+            sub_schema, path = self._discriminated(schema, resolver, key, field_name, field_value)
+            return self._valid_value(sub_schema, field_name, field_value, resolver, path)
+        matched = False
+        for index, sub_schema in enumerate(schema["oneOf"]):
+            try:
+                self._valid_value(sub_schema, field_name, field_value, resolver, f"{key}/oneOf/{index}")
+            except Exception:
+                continue
+            if matched:
+                raise ValueError(f"Field '{field_name}' matches more than one oneOf schema")
+            matched = True
+        if not matched:
+            raise ValueError(f"Field '{field_name}' doesnt match any oneOf schema")
+        return True
+
+    def _any_of(self, schema: dict, resolver: SchemaResolver, key: str, field_name: str, field_value) -> bool:
+        """Checks if value is valid for at least one of anyOf sub schemas, stopping on the first that matches.
+        If none matches, an Value Error Exception is raised.
+            :param schema: dict with the anyOf schema
+            :param resolver: SchemaResolver of the document where schema was found
+            :param key: string with the ref key or path that identifies the schema
+            :param field_name: string with the field name that will be validated
+            :param field_value: value that came in event for current field that is being validated
+            :return: boolean indicating if value matches one sub schema
+        """
+        for index, sub_schema in enumerate(schema["anyOf"]):
+            try:
+                return self._valid_value(sub_schema, field_name, field_value, resolver, f"{key}/anyOf/{index}")
+            except Exception:
+                continue
+        raise ValueError(f"Field '{field_name}' doesnt match any anyOf schema")
+
+    def _valid_value(self, schema: dict, field_name: str, field_value, resolver: SchemaResolver, path: str) -> bool:
+        """Validate a value with its schema. Resolves $ref and allOf of schema, checks oneOf, anyOf, const, enum and
+        type, and validates objects and array items with their own schemas. Objects validated by an oneOf or anyOf sub
+        schema aren't validated again with the properties of the schema that declares them.
+            :param schema: dict with the schema of value
+            :param field_name: string with the field name that will be validated
+            :param field_value: value that came in event for current field that is being validated
+            :param resolver: SchemaResolver of the document where schema was found
+            :param path: string with the path of schema, used to identify it when it isn't an $ref
+            :return: boolean indicating if value is valid
+        """
+        schema, resolver, key = resolver.resolve(schema)
+        key = key or path
+        schema = resolver.flatten(schema, key)
+        combined = "oneOf" in schema or "anyOf" in schema
+        if "oneOf" in schema:
+            self._one_of(schema, resolver, key, field_name, field_value)
+        if "anyOf" in schema:
+            self._any_of(schema, resolver, key, field_name, field_value)
+        if "const" in schema and field_value != schema["const"]:
+            raise ValueError(f"Expected {schema['const']!r} for field '{field_name}' received {field_value!r}")
+        if "enum" in schema and field_value not in schema["enum"]:
+            raise ValueError(f"Expected one of {schema['enum']} for field '{field_name}' received {field_value!r}")
+        data_type = schema.get("type", "object" if "properties" in schema else None)
+        if data_type is None:
+            return True
+        self._type_match_schema(data_type, field_name, field_value)
+        if data_type == "object" and not combined:
+            self._sub_validator(schema, resolver, key).valid_object(field_value)
+        elif data_type == "array" and "items" in schema:
+            for value in field_value:
+                self._valid_value(schema["items"], field_name, value, resolver, f"{key}/items")
+        return True
+
+    def _compile_schema(self, schema: dict, resolver: SchemaResolver, path: str, compiled_keys: set):
+        """Compile the sub validators and discriminators of an schema, going through the same sub schemas that
+        _valid_value goes. Keys already compiled are skipped, so recursive schemas are compiled only once.
+            :param schema: dict with the schema that will be compiled
+            :param resolver: SchemaResolver of the document where schema was found
+            :param path: string with the path of schema, used to identify it when it isn't an $ref
+            :param compiled_keys: set with the keys of schemas already compiled
+        """
+        schema, resolver, key = resolver.resolve(schema)
+        key = key or path
+        if key in compiled_keys:
+            return
+        compiled_keys.add(key)
+        schema = resolver.flatten(schema, key)
+        if "discriminator" in schema and "oneOf" in schema:
+            for sub_schema, sub_path in self._discriminator_branches(schema, resolver, key).values():
+                self._compile_schema(sub_schema, resolver, sub_path, compiled_keys)
+        for keyword in ("oneOf", "anyOf"):
+            for index, sub_schema in enumerate(schema.get(keyword, [])):
+                self._compile_schema(sub_schema, resolver, f"{key}/{keyword}/{index}", compiled_keys)
+        data_type = schema.get("type", "object" if "properties" in schema else None)
+        if data_type == "object" and "oneOf" not in schema and "anyOf" not in schema:
+            self._sub_validator(schema, resolver, key)._compile_properties(compiled_keys)
+        elif data_type == "array" and "items" in schema:
+            self._compile_schema(schema["items"], resolver, f"{key}/items", compiled_keys)
+
+    def _compile_properties(self, compiled_keys: set):
+        """Compile the sub schemas of each property of the object schema.
+            :param compiled_keys: set with the keys of schemas already compiled
+        """
+        for key, schema in self.schema_obj.items():
+            self._compile_schema(schema, self.resolver, f"{self.path}/properties/{key}", compiled_keys)
+
+    def compile(self) -> "EventsValidator":
+        """Compile all sub validators and discriminators of the schema at once, instead of compiling them when the first
+        event that uses them is validated.
+            :return: the validator itself
+        """
+        self._compile_properties({self.path})
+        return self
+
     def valid_object(self, event: dict) -> bool:
         """Validate event object. If event is valid, return True, else, it will show what is wrong with current event
         and return False.
@@ -110,19 +438,8 @@ class EventsValidator:
         try:
             if self._has_required(event) and self._fit_fields(event):
                 for key in event.keys():
-                    if self._type_match_schema(self.schema_obj[key]['type'], key, event[key]):
-                        if self.schema_obj[key]['type'] == 'object':
-                            EventsValidator(self.schema_obj[key]['required'],
-                                            self.schema_obj[key]['properties']).valid_object(event[key])
-                        elif self.schema_obj[key]['type'] == 'array':
-                            if self._type_match_schema(self.schema_obj[key]['items']['type'], key, event[key][0]):
-                                if self.schema_obj[key]['items']['type'] == 'object':
-                                    for sub_event in event[key]:
-                                        EventsValidator(self.schema_obj[key]['items']['required'],
-                                                    self.schema_obj[key]['items']['properties']).valid_object(sub_event)
-                                else:
-                                    for value in event[key]:
-                                        self._type_match_schema(self.schema_obj[key]['items']['type'], key, value)
+                    self._valid_value(self.schema_obj[key], key, event[key], self.resolver,
+                                      f"{self.path}/properties/{key}")
             return True
         except Exception as e:
             raise Exception(e)
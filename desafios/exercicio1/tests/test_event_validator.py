@@ -1,5 +1,13 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
-from event_validator import EventsValidator
+from unittest import mock
+
+import event_validator
+from event_validator import EventsValidator, SchemaResolver, load_validator
 
 
 class TestEventValidator(unittest.TestCase):
@@ -188,6 +196,269 @@ class TestEventValidator(unittest.TestCase):
         self.assertIsInstance(context.exception, Exception)
 
 
+class TestSchemaReferences(unittest.TestCase):
+    registry = {
+        "money.json": {
+            "definitions": {
+                "money": {
+                    "type": "object",
+                    "required": ["amount", "currency"],
+                    "properties": {
+                        "amount": {"type": "double"},
+                        "currency": {"type": "string"}
+                    }
+                }
+            }
+        }
+    }
+    schema = {
+        "type": "object",
+        "required": ["customer", "transaction"],
+        "definitions": {
+            "address": {
+                "type": "object",
+                "required": ["street"],
+                "properties": {
+                    "street": {"type": "string"},
+                    "number": {"type": "integer"}
+                }
+            },
+            "customer": {
+                "type": "object",
+                "required": ["name"],
+                "properties": {
+                    "name": {"type": "string"},
+                    "address": {"$ref": "#/definitions/address"},
+                    "billing_address": {"$ref": "#/definitions/address"}
+                }
+            },
+            "transaction_base": {
+                "type": "object",
+                "required": ["transaction_type", "value"],
+                "properties": {
+                    "transaction_type": {"type": "string"},
+                    "value": {"$ref": "money.json#/definitions/money"}
+                }
+            },
+            "pix": {
+                "allOf": [
+                    {"$ref": "#/definitions/transaction_base"},
+                    {"properties": {"transaction_type": {"const": "pix"}, "pix_key": {"type": "string"}},
+                     "required": ["pix_key"]}
+                ]
+            },
+            "boleto": {
+                "allOf": [
+                    {"$ref": "#/definitions/transaction_base"},
+                    {"properties": {"transaction_type": {"const": "boleto"}, "barcode": {"type": "string"}},
+                     "required": ["barcode"]}
+                ]
+            }
+        },
+        "properties": {
+            "customer": {"$ref": "#/definitions/customer"},
+            "transaction": {
+                "oneOf": [{"$ref": "#/definitions/pix"}, {"$ref": "#/definitions/boleto"}],
+                "discriminator": {"propertyName": "transaction_type"}
+            }
+        }
+    }
+
+    def _event(self, transaction: dict) -> dict:
+        return {
+            "customer": {
+                "name": "Pedro",
+                "address": {"street": "St. Blue", "number": 3},
+                "billing_address": {"street": "St. Red"}
+            },
+            "transaction": transaction
+        }
+
+    def test_valid_object_with_refs(self):
+        """
+        Sends an valid event that uses local refs, an ref to an registered schema, allOf and an oneOf with
+        discriminator.
+        """
+        validator = EventsValidator.from_schema(self.schema, self.registry)
+        event = self._event({"transaction_type": "pix", "pix_key": "pedro@iti.com",
+                             "value": {"amount": 10.5, "currency": "BRL"}})
+        self.assertTrue(validator.valid_object(event))
+
+    def test_invalid_object_with_refs(self):
+        """
+        Sends an invalid event, where the field of the registered schema that is referenced has the wrong type.
+        """
+        validator = EventsValidator.from_schema(self.schema, self.registry)
+        event = self._event({"transaction_type": "boleto", "barcode": "123",
+                             "value": {"amount": "10.5", "currency": "BRL"}})
+        with self.assertRaises(Exception):
+            validator.valid_object(event)
+
+    def test_one_of_discriminator(self):
+        """
+        Sends an event with an field that only exists in other oneOf schema than the one chosen by the discriminator,
+        and an event with an unknown discriminator value.
+        """
+        validator = EventsValidator.from_schema(self.schema, self.registry)
+        with self.assertRaises(Exception):
+            validator.valid_object(self._event({"transaction_type": "pix", "barcode": "123",
+                                                "value": {"amount": 10.5, "currency": "BRL"}}))
+        with self.assertRaises(Exception):
+            validator.valid_object(self._event({"transaction_type": "p2p",
+                                                "value": {"amount": 10.5, "currency": "BRL"}}))
+
+    def test_typed_object_union(self):
+        """
+        Sends events to oneOf and anyOf unions declared with "type": "object", which must be validated only by the sub
+        schema that matches, in the first use and after compiling the validator.
+        """
+        for keyword, extra in (("oneOf", {"discriminator": {"propertyName": "transaction_type"}}), ("oneOf", {}),
+                               ("anyOf", {})):
+            schema = {
+                "definitions": self.schema["definitions"],
+                "properties": {
+                    "transaction": {
+                        "type": "object",
+                        keyword: [{"$ref": "#/definitions/pix"}, {"$ref": "#/definitions/boleto"}],
+                        **extra
+                    }
+                }
+            }
+            for validator in (EventsValidator.from_schema(schema, self.registry),
+                              EventsValidator.from_schema(schema, self.registry).compile()):
+                event = {"transaction": {"transaction_type": "pix", "pix_key": "pedro@iti.com",
+                                         "value": {"amount": 10.5, "currency": "BRL"}}}
+                self.assertTrue(validator.valid_object(event))
+                with self.assertRaises(Exception):
+                    validator.valid_object({"transaction": {"transaction_type": "pix", "barcode": "123",
+                                                            "value": {"amount": 10.5, "currency": "BRL"}}})
+                with self.assertRaises(Exception):
+                    validator.valid_object({"transaction": "pix"})
+
+    def test_all_of_same_property(self):
+        """
+        Sends events to an allOf where both sub schemas declare the same property, so the value must match both.
+        """
+        schema = {
+            "definitions": {"base": {"type": "object", "properties": {"value": {"type": "integer"}}}},
+            "properties": {
+                "t": {"allOf": [{"$ref": "#/definitions/base"}, {"properties": {"value": {"description": "x"}}}]}
+            }
+        }
+        validator = EventsValidator.from_schema(schema)
+        self.assertTrue(validator.valid_object({"t": {"value": 1}}))
+        with self.assertRaises(Exception):
+            validator.valid_object({"t": {"value": "not an int"}})
+
+    def test_one_of_without_discriminator(self):
+        """
+        Sends events to an oneOf without discriminator, matching one schema, none of them and both of them.
+        """
+        schema = {"properties": {"value": {"oneOf": [{"type": "string"}, {"type": "integer"}, {"enum": [1, 2]}]}}}
+        validator = EventsValidator.from_schema(schema)
+        self.assertTrue(validator.valid_object({"value": "1"}))
+        with self.assertRaises(Exception):
+            validator.valid_object({"value": 1.5})
+        with self.assertRaises(Exception):
+            validator.valid_object({"value": 1})
+
+    def test_shared_sub_validator(self):
+        """
+        Checks that an referenced schema used by two fields is compiled into only one validator.
+        """
+        validator = EventsValidator.from_schema(self.schema, self.registry)
+        validator.valid_object(self._event({"transaction_type": "pix", "pix_key": "pedro@iti.com",
+                                            "value": {"amount": 10.5, "currency": "BRL"}}))
+        address_validators = [sub_validator for (kind, key), sub_validator in validator.compiled.items()
+                              if key == "#/definitions/address"]
+        self.assertEqual(1, len(address_validators))
+
+    def test_recursive_ref(self):
+        """
+        Sends an event to an schema that references itself, which must be validated until the end of the event.
+        """
+        schema = {
+            "definitions": {
+                "node": {
+                    "type": "object",
+                    "properties": {"name": {"type": "string"}, "child": {"$ref": "#/definitions/node"}}
+                }
+            },
+            "properties": {"root": {"$ref": "#/definitions/node"}}
+        }
+        validator = EventsValidator.from_schema(schema)
+        self.assertTrue(validator.valid_object({"root": {"name": "a", "child": {"name": "b", "child": {}}}}))
+        with self.assertRaises(Exception):
+            validator.valid_object({"root": {"name": "a", "child": {"name": 1}}})
+
+    def test_circular_ref(self):
+        """
+        Resolves an ref that points to an ref that points back to the first one, which must raise an ValueError.
+        """
+        schema = {"definitions": {"a": {"$ref": "#/definitions/b"}, "b": {"$ref": "#/definitions/a"}}}
+        with self.assertRaises(ValueError):
+            SchemaResolver(schema).resolve({"$ref": "#/definitions/a"})
+
+    def test_unknown_ref(self):
+        """
+        Resolves an ref to an schema that isnt registered, which must raise an ValueError.
+        """
+        with self.assertRaises(ValueError):
+            SchemaResolver({}).resolve({"$ref": "customer.json#/definitions/customer"})
+
+
+class TestLoadValidator(unittest.TestCase):
+    schema = {
+        "required": ["name"],
+        "definitions": {"address": {"type": "object", "properties": {"street": {"type": "string"}}}},
+        "properties": {"name": {"type": "string"}, "address": {"$ref": "#/definitions/address"}}
+    }
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.schema_path = os.path.join(self.directory.name, "schema.json")
+        self._write_schema(self.schema)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write_schema(self, schema: dict):
+        with open(self.schema_path, "w") as file:
+            json.dump(schema, file)
+
+    def test_load_validator(self):
+        """
+        Loads the validator, checking that referenced schemas are compiled before the first event is validated.
+        """
+        validator = load_validator(self.schema_path)
+        self.assertIn(("object", "#/definitions/address"), validator.compiled)
+        self.assertTrue(validator.valid_object({"name": "Pedro", "address": {"street": "St. Blue"}}))
+        with self.assertRaises(Exception):
+            validator.valid_object({"name": "Pedro", "address": {"street": 3}})
+
+    def test_handler_loads_validator_once(self):
+        """
+        Handles two events, checking that the schema is loaded only on the first one and both events are sent.
+        """
+        validator = load_validator(self.schema_path)
+        with mock.patch.object(event_validator, "_VALIDATOR", None), \
+                mock.patch.object(event_validator, "load_validator", return_value=validator) as load, \
+                mock.patch.object(event_validator, "send_event_to_queue") as send:
+            event_validator.handler({"name": "Pedro"})
+            event_validator.handler({"name": "Maria"})
+        load.assert_called_once_with("schema.json")
+        self.assertEqual(2, send.call_count)
+
+    def test_boto3_not_imported(self):
+        """
+        Imports the module in a new interpreter, checking that boto3 is only imported when the first event is sent.
+        """
+        code = "import sys, event_validator; print('boto3' in sys.modules)"
+        directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True)
+        self.assertEqual("False", output.stdout.strip())
+
+
 if __name__ == '__main__':
     # begin the unittest.main()
     unittest.main()
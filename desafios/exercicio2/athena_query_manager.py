@@ -0,0 +1,135 @@
+import hashlib
+import re
+import time
+
+# quoted strings and identifiers are kept as they are when queries are normalized
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+# only queries that read data are cached, so DDL and inserts are always executed
+_READ_ONLY = ("select", "with", "show", "describe", "explain", "values")
+_FINAL_STATES = ("SUCCEEDED", "FAILED", "CANCELLED")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize an SQL query, so the same query written with different spaces, line breaks, keyword case or final ';'
+    has the same text. Quoted strings and identifiers are not changed.
+        :param query: string with SQL query
+        :return: string with normalized query
+    """
+    parts = _QUOTED.split(query.strip().rstrip(";").strip())
+    # split keeps quoted parts on odd positions
+    return "".join(part if index % 2 else " ".join(part.split()).lower() for index, part in enumerate(parts))
+
+
+class AthenaQueryManager:
+    def __init__(self, client, output_location: str = "s3://iti-query-results/", cache_ttl: float = 3600,
+                 poll_interval: float = 0.2, max_poll_interval: float = 5.0, clock=time.monotonic, sleep=time.sleep):
+        self.client = client
+        self.output_location = output_location
+        self.cache_ttl = cache_ttl
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.clock = clock
+        self.sleep = sleep
+        # last status received for each execution id submitted
+        self.executions = {}
+        # execution id and submission time of read only queries, keyed by the hash of normalized query
+        self.cache = {}
+
+    def submit(self, query: str) -> str:
+        """Submit an query to Athena. If the same read only query was submitted less than cache_ttl seconds ago and
+        didn't fail, its execution id is returned instead, so the query isn't executed (and billed) again. Expired cache
+        entries are removed, so the cache only keeps queries submitted in the last cache_ttl seconds.
+            :param query: string with SQL query
+            :return: string with query execution id
+        """
+        normalized = normalize_query(query)
+        query_hash = hashlib.sha256(normalized.encode()).hexdigest()
+        now = self.clock()
+        self.cache = {key: value for key, value in self.cache.items() if now - value[1] < self.cache_ttl}
+        if query_hash in self.cache:
+            return self.cache[query_hash][0]
+        execution_id = self.client.start_query_execution(
+            QueryString=query,
+            ResultConfiguration={
+                'OutputLocation': self.output_location
+            }
+        )["QueryExecutionId"]
+        self.executions[execution_id] = {"State": "QUEUED"}
+        if normalized.startswith(_READ_ONLY):
+            self.cache[query_hash] = (execution_id, self.clock())
+        return execution_id
+
+    def _poll(self, execution_id: str) -> dict:
+        """Get the current status of an execution. Executions that failed or were cancelled are removed from cache, so
+        the next submit of the same query executes it again.
+            :param execution_id: string with query execution id
+            :return: dict with execution status
+        """
+        status = self.client.get_query_execution(QueryExecutionId=execution_id)["QueryExecution"]["Status"]
+        self.executions[execution_id] = status
+        if status["State"] in ("FAILED", "CANCELLED"):
+            self.cache = {key: value for key, value in self.cache.items() if value[0] != execution_id}
+        return status
+
+    def wait(self, execution_ids: list, timeout: float = None) -> dict:
+        """Wait until all executions finish. All pending executions are polled in each round, and the interval between
+        rounds doubles (up to max_poll_interval) while no execution finishes, going back to poll_interval when some
+        execution finishes. The last sleep is shortened to end on the timeout, and executions are polled once more
+        then. If they still didn't finish, an Timeout Error Exception is raised indicating which executions are
+        pending.
+            :param execution_ids: list with query execution ids
+            :param timeout: float with maximum seconds to wait, no limit if not informed
+            :return: dict with final status of each execution, keyed by execution id
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        pending = [execution_id for execution_id in dict.fromkeys(execution_ids)
+                   if self.executions.get(execution_id, {}).get("State") not in _FINAL_STATES]
+        interval = None
+        while pending:
+            running = [execution_id for execution_id in pending
+                       if self._poll(execution_id)["State"] not in _FINAL_STATES]
+            if not running:
+                break
+            if interval is None or len(running) < len(pending):
+                interval = self.poll_interval
+            else:
+                interval = min(interval * 2, self.max_poll_interval)
+            remaining = interval if deadline is None else deadline - self.clock()
+            if remaining <= 0:
+                raise TimeoutError(f"Queries still running after {timeout} seconds: {running}")
+            self.sleep(min(interval, remaining))
+            pending = running
+        return {execution_id: self.executions[execution_id] for execution_id in execution_ids}
+
+    def results(self, execution_id: str, page_size: int = 1000):
+        """Stream the rows of an execution, page by page, as lists of values. Waits the execution to finish and, if it
+        didn't succeed, an Runtime Error Exception is raised with the reason. Athena returns the column names as the
+        first row of SELECT results, so this row is skipped.
+            :param execution_id: string with query execution id
+            :param page_size: integer with rows requested in each page
+            :return: generator of lists with row values
+        """
+        status = self.wait([execution_id])[execution_id]
+        if status["State"] != "SUCCEEDED":
+            raise RuntimeError(f"Query {execution_id} {status['State']}: {status.get('StateChangeReason', '')}")
+        pages = self.client.get_paginator("get_query_results").paginate(
+            QueryExecutionId=execution_id,
+            PaginationConfig={"PageSize": page_size}
+        )
+        first_page = True
+        for page in pages:
+            rows = [[column.get("VarCharValue") for column in row["Data"]] for row in page["ResultSet"]["Rows"]]
+            if first_page:
+                labels = [column["Label"] for column in page["ResultSet"]["ResultSetMetadata"]["ColumnInfo"]]
+                if rows and rows[0] == labels:
+                    rows = rows[1:]
+                first_page = False
+            yield from rows
+
+    def query(self, query: str, page_size: int = 1000):
+        """Submit an query, using cache, and stream its rows.
+            :param query: string with SQL query
+            :param page_size: integer with rows requested in each page
+            :return: generator of lists with row values
+        """
+        return self.results(self.submit(query), page_size)
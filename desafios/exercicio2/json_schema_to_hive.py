@@ -1,6 +1,10 @@
 import json
+from urllib.parse import urljoin
+
+from athena_query_manager import AthenaQueryManager
 
 _ATHENA_CLIENT = None
+_QUERY_MANAGER = None
 
 
 def create_hive_table_with_athena(query):
@@ -30,14 +34,152 @@ def handler():
     file = open("schema.json")
     schema = json.load(file)
     constructor = SchemaToAthena(schema)
-    create_hive_table_with_athena(constructor.create_table_query())
+    query = constructor.create_table_query()
+    print(f"Query: {query}")
+    # the query is submitted by the query manager, since create_hive_table_with_athena doesnt return the execution id
+    query_manager = _QUERY_MANAGER or AthenaQueryManager(_ATHENA_CLIENT)
+    execution_id = query_manager.submit(query)
+    status = query_manager.wait([execution_id], timeout=60)[execution_id]
+    if status["State"] != "SUCCEEDED":
+        raise RuntimeError(f"Create table {status['State']}: {status.get('StateChangeReason', '')}")
+
+
+class SchemaResolver:
+    def __init__(self, document: dict, registry: dict = None, uri: str = None, shared: dict = None):
+        self.document = document
+        self.registry = registry or {}
+        self.uri = document.get("$id", "").split("#")[0] if uri is None else uri
+        # state shared by the resolvers of every document, so each document and each merge is only processed once
+        self.shared = shared if shared is not None else {"documents": {}, "merged": {}}
+        self.shared["documents"][self.uri] = self
+
+    def _document_key(self, uri: str) -> str:
+        """Find the key of a referenced document. The uri is looked up as it is written in the $ref, then relative to
+        current document uri, and finally against the $id declared by the registered schemas. If no document is found,
+        an Value Error Exception is raised indicating which are the registered schemas.
+            :param uri: string with the document part of an $ref
+            :return: string with the key of the document on registry
+        """
+        if not uri or uri == self.uri:
+            return self.uri
+        candidates = (uri, urljoin(self.uri, uri))
+        for candidate in candidates:
+            if candidate in self.shared["documents"] or candidate in self.registry:
+                return candidate
+        for key, document in self.registry.items():
+            if document.get("$id", "").split("#")[0] in candidates:
+                return key
+        raise ValueError(f"Referenced schema '{uri}' is not registered. Registered schemas are: {list(self.registry)}")
+
+    def _for_document(self, uri: str) -> "SchemaResolver":
+        """Return the resolver of a referenced document, creating it on the first time the document is referenced.
+            :param uri: string with the document part of an $ref
+            :return: SchemaResolver of the referenced document
+        """
+        key = self._document_key(uri)
+        if key not in self.shared["documents"]:
+            SchemaResolver(self.registry[key], self.registry, key, self.shared)
+        return self.shared["documents"][key]
+
+    def _pointer(self, pointer: str):
+        """Walk through current document following an JSON pointer, like '/definitions/address'.
+            :param pointer: string with the fragment part of an $ref
+            :return: sub schema pointed
+        """
+        node = self.document
+        for part in filter(None, pointer.split("/")):
+            part = part.replace("~1", "/").replace("~0", "~")
+            try:
+                node = node[int(part)] if isinstance(node, list) else node[part]
+            except (KeyError, IndexError, ValueError):
+                raise ValueError(f"Could not resolve '#{pointer}' in schema '{self.uri}'")
+        return node
+
+    def resolve(self, schema: dict) -> tuple:
+        """Follow $ref of schema until an schema without $ref is found. Each ref visited is kept, so if the same ref is
+        visited twice, an Value Error Exception is raised indicating the cycle found.
+            :param schema: dict with the schema that will be resolved
+            :return: tuple with the resolved schema, the resolver of the document where it was found and the ref key
+                that identifies it (None when schema isn't an $ref)
+        """
+        resolver, key, visited = self, None, []
+        while "$ref" in schema:
+            uri, _, pointer = schema["$ref"].partition("#")
+            resolver = resolver._for_document(uri)
+            key = f"{resolver.uri}#{pointer}"
+            if key in visited:
+                raise ValueError(f"Circular $ref found: {' -> '.join(visited + [key])}")
+            visited.append(key)
+            schema = resolver._pointer(pointer)
+        return schema, resolver, key
+
+    def _absolute(self, schema):
+        """Copy an schema of current document replacing its $ref by refs that can be resolved from any document.
+            :param schema: schema (or part of it) that will be copied
+            :return: copy of schema with absolute refs
+        """
+        if isinstance(schema, list):
+            return [self._absolute(item) for item in schema]
+        if not isinstance(schema, dict):
+            return schema
+        copy = {key: self._absolute(value) for key, value in schema.items()}
+        if isinstance(schema.get("$ref"), str):
+            uri, _, pointer = schema["$ref"].partition("#")
+            copy["$ref"] = f"{self._document_key(uri)}#{pointer}"
+        return copy
+
+    def merge(self, schema: dict, key: str) -> dict:
+        """Merge allOf, anyOf and oneOf sub schemas into a single schema, since an Athena column has only one type.
+        Properties of all sub schemas are joined in the same struct, and a property declared by more than one sub schema
+        is merged the same way. If sub schemas declare different types, an Value Error Exception is raised.
+        The merged schema is kept by key, together with the schema it came from, so each schema is merged only once.
+            :param schema: dict with the schema (already resolved) that will be merged
+            :param key: string with the ref key or path that identifies the schema
+            :return: dict with schema without allOf, anyOf and oneOf
+        """
+        keywords = ("allOf", "anyOf", "oneOf")
+        if not any(keyword in schema for keyword in keywords):
+            return schema
+        cached = self.shared["merged"].get(key)
+        if cached is None or cached[0] is not schema:
+            merged = {name: value for name, value in schema.items() if name not in keywords}
+            sub_schemas = [(keyword, index, sub) for keyword in keywords
+                           for index, sub in enumerate(schema.get(keyword, []))]
+            for keyword, index, sub_schema in sub_schemas:
+                sub_schema, resolver, sub_key = self.resolve(sub_schema)
+                sub_schema = resolver.merge(sub_schema, sub_key or f"{key}/{keyword}/{index}")
+                if resolver is not self:
+                    sub_schema = resolver._absolute(sub_schema)
+                merged_type = merged.get("type", "object" if "properties" in merged else None)
+                sub_type = sub_schema.get("type", "object" if "properties" in sub_schema else None)
+                if merged_type and sub_type and merged_type != sub_type:
+                    raise ValueError(f"Cannot create a column with types '{merged_type}' and '{sub_type}'")
+                for name, value in sub_schema.items():
+                    if name == "properties":
+                        properties = dict(merged.get("properties", {}))
+                        for prop_name, prop in value.items():
+                            if prop_name in properties and properties[prop_name] != prop:
+                                prop = self.merge({"allOf": [properties[prop_name], prop]},
+                                                  f"{key}/properties/{prop_name}")
+                            properties[prop_name] = prop
+                        merged["properties"] = properties
+                    else:
+                        merged[name] = value
+            self.shared["merged"][key] = (schema, merged)
+        return self.shared["merged"][key][1]
 
 
 class SchemaToAthena:
     def __init__(self, schema: dict,
                  row_format="ROW FORMAT SERDE 'org.openx.data.jsonserde.JsonSerDe'",
-                 location="s3://iti-athena/"):
+                 location="s3://iti-athena/",
+                 registry: dict = None):
         self.schema = schema
+        self.resolver = SchemaResolver(schema, registry)
+        # types already generated for each $ref, so an schema referenced many times is processed once
+        self.ref_types = {}
+        # refs that are being processed, used to find schemas that reference themselves
+        self.resolving = []
         self.data_types = {
             "object": "struct",
             "integer": "int"
@@ -54,55 +196,82 @@ class SchemaToAthena:
         table_name = title.lower().replace(" ", "_")
         return table_name
 
-    def _get_sub_struct(self, struct: dict) -> str:
+    def _get_sub_struct(self, struct: dict, resolver: SchemaResolver = None, path: str = None) -> str:
         """ Create string with an struct field. It will 'recall' _get_struc_properties to get all fields that are in
         current struct field, replace the space between col name and col type for an ':' and join all fields with an ','
         Finally, a string will be returned.
+            :param resolver: SchemaResolver of the document where struct was found, root schema if not informed
+            :param path: string with the ref key or path of the struct schema, root of document if not informed
             :return: String with struct column
         """
-        struct_cols = self._get_struct_properties(struct)
+        struct_cols = self._get_struct_properties(struct, resolver, path)
         struct_cols = [col.replace(" ", ":") for col in struct_cols]
         struct_cols = ",".join(struct_cols)
         return struct_cols
 
-    def _get_list(self, struct: dict) -> str:
+    def _get_list(self, struct: dict, resolver: SchemaResolver = None, path: str = None) -> str:
         """ Create string with an array field. It will call _get_sub_struc if items of array are objects, if it isnt,
         it will return only data type of item.
         Finally, a string will be returned with type of items from array.
+            :param resolver: SchemaResolver of the document where struct was found, root schema if not informed
+            :param path: string with the path of items schema
             :return: String with array data type
         """
-        if struct.get('type') == "object":
-            list_data_type = f"struct<{self._get_sub_struct(struct.get('properties', {}))}>"
+        return self._get_type(struct, resolver, path)
+
+    def _get_type(self, value: dict, resolver: SchemaResolver = None, path: str = None) -> str:
+        """ Create string with the Athena type of an property. $ref are resolved and allOf/anyOf/oneOf are merged before
+        the type is created. Types of refs are kept, so each referenced schema is processed only once. If an ref
+        references itself, an Value Error Exception is raised, since Athena types cannot be recursive.
+            :param value: Dict with the property schema
+            :param resolver: SchemaResolver of the document where value was found, root schema if not informed
+            :param path: string with the path of value, used to identify it when it isn't an $ref
+            :return: String with property data type
+        """
+        value, resolver, key = (resolver or self.resolver).resolve(value)
+        path = key or path or f"{resolver.uri}#"
+        if key in self.ref_types:
+            return self.ref_types[key]
+        if key in self.resolving:
+            cycle = self.resolving[self.resolving.index(key):] + [key]
+            raise ValueError(f"Schema '{key}' references itself and cannot be an Athena type: {' -> '.join(cycle)}")
+        if key:
+            self.resolving.append(key)
+        value = resolver.merge(value, path)
+        data_type = value.get("type", "object" if "properties" in value else "string")
+        if data_type == "object":
+            struct_cols = self._get_sub_struct(value.get('properties', {}), resolver, path)
+            col_type = f"{self.data_types['object']}<{struct_cols}>"
+        elif data_type == "array":
+            col_type = f"array<{self._get_list(value.get('items', {}), resolver, f'{path}/items')}>"
         else:
-            list_data_type = self.data_types.get(struct.get("type", "string"), struct.get("type"))
-        
-        return list_data_type
+            col_type = self.data_types.get(data_type, data_type)
+        if key:
+            self.resolving.pop()
+            self.ref_types[key] = col_type
+        return col_type
 
-    def _get_struct_properties(self, properties: dict) -> list:
+    def _get_struct_properties(self, properties: dict, resolver: SchemaResolver = None, path: str = None) -> list:
         """ Create list with columns that will be used in Athena table. Iterates over properties items, and generate
         strings representing each property and it's type, appending this string to an list, that will be returned in the
         end of iteration.
             :param properties: Dict with all properties that will be processed to form columns string
+            :param resolver: SchemaResolver of the document where properties were found, root schema if not informed
+            :param path: string with the ref key or path of the object schema, root of document if not informed
             :return: list of columns of table
         """
-        cols = []
-        for key, value in properties.items():
-            if value.get("type") == "object":
-                cols.append(f"'{key}' {self.data_types.get(value.get('type', 'string'), value.get('type'))}"
-                            f"<{self._get_sub_struct(value.get('properties',{}))}>")
-            elif value.get("type") == "array":
-                cols.append(f"'{key}' {self.data_types.get(value.get('type', 'string'), value.get('type'))}"
-                            f"<{self._get_list(value.get('items'))}>")
-            else:
-                cols.append(f"'{key}' {self.data_types.get(value.get('type', 'string'), value.get('type'))}")
-        return cols
-
-    def _table_cols(self, properties: dict) -> str:
+        path = path or f"{(resolver or self.resolver).uri}#"
+        return [f"'{key}' {self._get_type(value, resolver, f'{path}/properties/{key}')}"
+                for key, value in properties.items()]
+
+    def _table_cols(self, properties: dict, resolver: SchemaResolver = None, path: str = None) -> str:
         """ Join list of columns generated by _get_struct_properties with an ',\n' and return it as an string
             :param properties: Dict with all properties that will be processed to form columns string
+            :param resolver: SchemaResolver of the document where properties were found, root schema if not informed
+            :param path: string with the ref key or path of the object schema, root of document if not informed
             :return: string with columns of table
         """
-        cols = self._get_struct_properties(properties)
+        cols = self._get_struct_properties(properties, resolver, path)
         return ",\n".join(cols)
 
     def create_table_query(self) -> str:
@@ -111,7 +280,9 @@ class SchemaToAthena:
             :return: string with query that will create Athena table
         """
         table_name = self._get_table_name()
-        cols = self._table_cols(self.schema.get("properties", {}))
+        schema, resolver, key = self.resolver.resolve(self.schema)
+        key = key or f"{resolver.uri}#"
+        cols = self._table_cols(resolver.merge(schema, key).get("properties", {}), resolver, key)
         table_query = f"CREATE EXTERNAL TABLE IF NOT EXISTS {table_name}({cols})" \
                       f" ROW FORMAT '{self.row_format}' LOCATION '{self.location}'"
         return table_query
@@ -1,8 +1,18 @@
 import boto3
 from moto import mock_athena, mock_s3
+from moto.athena.models import athena_backends
 
+from athena_query_manager import AthenaQueryManager
 import json_schema_to_hive as js_2_hive
 
+
+def finish_queries(seconds):
+    # moto keeps executions QUEUED, so the simulation finishes them while the query manager waits
+    for execution in athena_backends['us-east-1'].executions.values():
+        if execution.status == 'QUEUED':
+            execution.status = 'SUCCEEDED'
+
+
 @mock_athena
 @mock_s3
 def main():
@@ -12,6 +22,7 @@ def main():
     _ATHENA_CLIENT = boto3.client('athena', region_name='us-east-1')
 
     js_2_hive._ATHENA_CLIENT = _ATHENA_CLIENT
+    js_2_hive._QUERY_MANAGER = AthenaQueryManager(_ATHENA_CLIENT, sleep=finish_queries)
     js_2_hive.handler()
     
 if __name__ == "__main__":
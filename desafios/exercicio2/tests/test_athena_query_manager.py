@@ -0,0 +1,156 @@
+import unittest
+
+import boto3
+from botocore.stub import Stubber
+from moto import mock_athena
+
+from athena_query_manager import AthenaQueryManager, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestAthenaQueryManager(unittest.TestCase):
+    query = "SELECT customer_id, AVG(value) FROM movements WHERE transaction_type = 'Pix' GROUP BY customer_id"
+
+    def setUp(self):
+        athena = mock_athena()
+        athena.start()
+        self.addCleanup(athena.stop)
+        self.client = boto3.client("athena", region_name="us-east-1")
+        self.clock = FakeClock()
+        self.manager = AthenaQueryManager(self.client, cache_ttl=60, poll_interval=1, max_poll_interval=4,
+                                          clock=self.clock, sleep=self.clock.sleep)
+
+    def test_normalize_query(self):
+        """Tests that spaces, line breaks, keyword case and final ';' are normalized, keeping quoted strings.
+        """
+        query = "select  customer_id,\n  avg(VALUE)\nfrom MOVEMENTS where transaction_type = 'Pix'" \
+                "  group by customer_id;"
+        self.assertEqual(normalize_query(self.query), normalize_query(query))
+        self.assertNotEqual(normalize_query(self.query), normalize_query(self.query.replace("'Pix'", "'pix'")))
+
+    def test_submit_cached(self):
+        """Tests that the same read only query submitted twice is executed once, until cache_ttl expires, and that DDL
+        queries are always executed.
+        """
+        execution_id = self.manager.submit(self.query)
+        same_query = "  " + self.query.replace(" FROM ", "\n from ") + ";"
+        self.assertEqual(execution_id, self.manager.submit(same_query))
+        self.clock.now += 61
+        self.assertNotEqual(execution_id, self.manager.submit(self.query))
+        ddl = "CREATE EXTERNAL TABLE IF NOT EXISTS movements (value double)"
+        self.assertNotEqual(self.manager.submit(ddl), self.manager.submit(ddl))
+
+    def test_expired_cache_pruned(self):
+        """Tests that cache entries older than cache_ttl are removed when an query is submitted.
+        """
+        self.manager.submit(self.query)
+        self.clock.now += 30
+        self.manager.submit("SELECT 1")
+        self.assertEqual(2, len(self.manager.cache))
+        self.clock.now += 31
+        self.manager.submit("SELECT 2")
+        self.assertEqual(2, len(self.manager.cache))
+        self.clock.now += 61
+        self.manager.submit("CREATE EXTERNAL TABLE IF NOT EXISTS movements (value double)")
+        self.assertEqual({}, self.manager.cache)
+
+    def test_wait_with_backoff(self):
+        """Tests that many executions are polled together, with an interval that doubles while none finishes and goes
+        back to poll_interval when some execution finishes. Executions are cancelled while the manager sleeps.
+        """
+        execution_ids = [self.manager.submit(f"SELECT {i}") for i in range(2)]
+
+        def sleep(seconds):
+            self.clock.sleep(seconds)
+            if len(self.clock.sleeps) in (3, 5):
+                self.client.stop_query_execution(QueryExecutionId=execution_ids[len(self.clock.sleeps) // 4])
+
+        self.manager.sleep = sleep
+        statuses = self.manager.wait(execution_ids)
+        self.assertEqual(["CANCELLED", "CANCELLED"], [statuses[i]["State"] for i in execution_ids])
+        self.assertEqual([1, 2, 4, 1, 2], self.clock.sleeps)
+
+    def test_cancelled_not_cached(self):
+        """Tests that an cancelled execution is removed from cache, so the query is executed again.
+        """
+        execution_id = self.manager.submit(self.query)
+        self.client.stop_query_execution(QueryExecutionId=execution_id)
+        self.manager.wait([execution_id])
+        self.assertNotEqual(execution_id, self.manager.submit(self.query))
+        with self.assertRaises(RuntimeError):
+            list(self.manager.results(execution_id))
+
+    def test_wait_timeout(self):
+        """Tests that the last sleep ends on the timeout, and an TimeoutError is raised when executions dont finish
+        before the timeout.
+        """
+        execution_id = self.manager.submit(self.query)
+        with self.assertRaises(TimeoutError):
+            self.manager.wait([execution_id], timeout=5)
+        self.assertEqual([1, 2, 2], self.clock.sleeps)
+
+    def test_finished_on_timeout(self):
+        """Tests that executions are polled once more on the timeout, so an execution that finishes during the last
+        sleep isn't reported as timed out.
+        """
+        execution_id = self.manager.submit(self.query)
+
+        def sleep(seconds):
+            self.clock.sleep(seconds)
+            if self.clock.now >= 5:
+                self.client.stop_query_execution(QueryExecutionId=execution_id)
+
+        self.manager.sleep = sleep
+        self.assertEqual("CANCELLED", self.manager.wait([execution_id], timeout=5)[execution_id]["State"])
+        self.assertEqual([1, 2, 2], self.clock.sleeps)
+
+
+class TestAthenaQueryResults(unittest.TestCase):
+    def _page(self, rows: list, next_token: str = None) -> dict:
+        page = {
+            "ResultSet": {
+                "Rows": [{"Data": [{"VarCharValue": value} for value in row]} for row in rows],
+                "ResultSetMetadata": {"ColumnInfo": [{"Name": "customer_id", "Label": "customer_id", "Type": "varchar"},
+                                                     {"Name": "mean", "Label": "mean", "Type": "double"}]}
+            }
+        }
+        if next_token:
+            page["NextToken"] = next_token
+        return page
+
+    def test_results_pages(self):
+        """Tests that rows of all pages are streamed, skipping the column names of the first page. Athena results
+        aren't supported by moto, so responses are stubbed.
+        """
+        client = boto3.client("athena", region_name="us-east-1", aws_access_key_id="test",
+                              aws_secret_access_key="test")
+        stubber = Stubber(client)
+        stubber.add_response("get_query_execution", {"QueryExecution": {"Status": {"State": "SUCCEEDED"}}},
+                             {"QueryExecutionId": "execution"})
+        stubber.add_response("get_query_results", self._page([["customer_id", "mean"], ["1", "75.0"]], "page-2"),
+                             {"QueryExecutionId": "execution", "MaxResults": 2})
+        stubber.add_response("get_query_results", self._page([["customer_id", "10.0"]]),
+                             {"QueryExecutionId": "execution", "MaxResults": 2, "NextToken": "page-2"})
+        manager = AthenaQueryManager(client)
+        with stubber:
+            rows = manager.results("execution", page_size=2)
+            self.assertEqual(["1", "75.0"], next(rows))
+            self.assertEqual([["customer_id", "10.0"]], list(rows))
+        stubber.assert_no_pending_responses()
+
+
+if __name__ == '__main__':
+    # begin the unittest.main()
+    unittest.main()
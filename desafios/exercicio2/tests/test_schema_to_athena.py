@@ -1,4 +1,12 @@
+import os
 import unittest
+
+import boto3
+from moto import mock_athena
+from moto.athena.models import athena_backends
+
+import json_schema_to_hive
+from athena_query_manager import AthenaQueryManager
 from json_schema_to_hive import SchemaToAthena
 
 
@@ -266,6 +274,172 @@ class TestSchemaToAthena(unittest.TestCase):
         self.assertEqual(self.expected_table_query, self.schema_to_athena.create_table_query())
 
 
+
+class TestSchemaReferencesToAthena(unittest.TestCase):
+    registry = {
+        "money.json": {
+            "definitions": {
+                "money": {
+                    "type": "object",
+                    "properties": {
+                        "amount": {"type": "double"},
+                        "currency": {"type": "string"}
+                    }
+                }
+            }
+        }
+    }
+    schema_obj = {
+        "title": "Transactions",
+        "definitions": {
+            "address": {
+                "type": "object",
+                "properties": {
+                    "street": {"type": "string"},
+                    "number": {"type": "integer"}
+                }
+            },
+            "pix": {
+                "type": "object",
+                "properties": {"transaction_type": {"const": "pix"}, "pix_key": {"type": "string"}}
+            },
+            "boleto": {
+                "type": "object",
+                "properties": {"transaction_type": {"const": "boleto"}, "barcode": {"type": "string"}}
+            }
+        },
+        "properties": {
+            "address": {"$ref": "#/definitions/address"},
+            "addresses": {"type": "array", "items": {"$ref": "#/definitions/address"}},
+            "value": {"$ref": "money.json#/definitions/money"},
+            "transaction": {"oneOf": [{"$ref": "#/definitions/pix"}, {"$ref": "#/definitions/boleto"}]},
+            "customer": {
+                "allOf": [
+                    {"properties": {"name": {"type": "string"}}},
+                    {"properties": {"age": {"type": "integer"}}}
+                ]
+            }
+        }
+    }
+
+    def test_get_struct_properties_with_refs(self):
+        """Tests that refs to local definitions and to registered schemas, and allOf/oneOf schemas, are converted to
+        the same columns that would be created if the schemas were declared inline.
+        """
+        schema_to_athena = SchemaToAthena(self.schema_obj, registry=self.registry)
+        address = "struct<'street':string,'number':int>"
+        expected_list = [f"'address' {address}",
+                         f"'addresses' array<{address}>",
+                         "'value' struct<'amount':double,'currency':string>",
+                         "'transaction' struct<'transaction_type':string,'pix_key':string,'barcode':string>",
+                         "'customer' struct<'name':string,'age':int>"]
+        self.assertEqual(expected_list, schema_to_athena._get_struct_properties(self.schema_obj["properties"]))
+        self.assertEqual(address, schema_to_athena.ref_types["#/definitions/address"])
+
+    def test_recursive_ref(self):
+        """Tests that an schema that references itself raises an ValueError, since it cant be an Athena type.
+        """
+        schema = {
+            "definitions": {
+                "node": {"type": "object", "properties": {"child": {"$ref": "#/definitions/node"}}}
+            },
+            "properties": {"root": {"$ref": "#/definitions/node"}}
+        }
+        with self.assertRaises(ValueError):
+            SchemaToAthena(schema).create_table_query()
+
+    def test_merge_same_property(self):
+        """Tests that an property declared by more than one oneOf schema is merged with the properties of all of them.
+        """
+        schema = {
+            "properties": {
+                "transaction": {
+                    "oneOf": [
+                        {"properties": {"key": {"type": "object", "properties": {"pix_key": {"type": "string"}}}}},
+                        {"properties": {"key": {"type": "object", "properties": {"barcode": {"type": "string"}}}}}
+                    ]
+                }
+            }
+        }
+        expected_list = ["'transaction' struct<'key':struct<'pix_key':string,'barcode':string>>"]
+        self.assertEqual(expected_list, SchemaToAthena(schema)._get_struct_properties(schema["properties"]))
+
+    def test_conflicting_property_types(self):
+        """Tests that an property declared with different types by oneOf schemas raises an ValueError.
+        """
+        schema = {
+            "properties": {
+                "transaction": {
+                    "oneOf": [
+                        {"properties": {"key": {"type": "string"}}},
+                        {"properties": {"key": {"type": "object", "properties": {"a": {"type": "integer"}}}}}
+                    ]
+                }
+            }
+        }
+        with self.assertRaises(ValueError):
+            SchemaToAthena(schema).create_table_query()
+
+    def test_conflicting_types(self):
+        """Tests that an oneOf with different types raises an ValueError, since an column has only one type.
+        """
+        schema = {"properties": {"value": {"oneOf": [{"type": "string"}, {"type": "integer"}]}}}
+        with self.assertRaises(ValueError):
+            SchemaToAthena(schema).create_table_query()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestHandler(unittest.TestCase):
+    def setUp(self):
+        athena = mock_athena()
+        athena.start()
+        self.addCleanup(athena.stop)
+        # handler reads schema.json from the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.clock = FakeClock()
+        client = boto3.client("athena", region_name="us-east-1")
+        manager = AthenaQueryManager(client, clock=self.clock, sleep=self.sleep)
+        for name, value in (("_ATHENA_CLIENT", client), ("_QUERY_MANAGER", manager)):
+            self.addCleanup(setattr, json_schema_to_hive, name, getattr(json_schema_to_hive, name))
+            setattr(json_schema_to_hive, name, value)
+
+    def sleep(self, seconds: float):
+        # moto keeps executions QUEUED, so they are finished with final_state while the handler waits
+        self.clock.sleep(seconds)
+        for execution in athena_backends["us-east-1"].executions.values():
+            execution.status = self.final_state
+
+    def test_create_table_succeeded(self):
+        """Tests that the handler waits the create table query to succeed.
+        """
+        self.final_state = "SUCCEEDED"
+        json_schema_to_hive.handler()
+        self.assertEqual([0.2], self.clock.sleeps)
+        self.assertEqual(["SUCCEEDED"], [execution.status for execution
+                                         in athena_backends["us-east-1"].executions.values()])
+
+    def test_create_table_failed(self):
+        """Tests that the handler raises an RuntimeError when the create table query fails.
+        """
+        self.final_state = "FAILED"
+        with self.assertRaisesRegex(RuntimeError, "Create table FAILED"):
+            json_schema_to_hive.handler()
+        self.assertEqual([0.2], self.clock.sleeps)
+
+
 if __name__ == '__main__':
     # begin the unittest.main()
     unittest.main()
@@ -0,0 +1,35 @@
+import os
+import tempfile
+from itertools import islice
+
+from transaction_aggregator import TransactionAggregator
+
+
+def main(events):
+    checkpoint_path = os.path.join(tempfile.gettempdir(), "transaction_aggregator.checkpoint")
+    aggregator = TransactionAggregator(checkpoint_path, checkpoint_every=2)
+    # the consumer stops after 3 events, so the third event isn't on the checkpoint
+    aggregator.add_many(events[:3])
+    for row in aggregator.emit():
+        print(row)
+
+    restarted = TransactionAggregator(checkpoint_path, checkpoint_every=2)
+    print(f"Restarted from event {restarted.offset}")
+    restarted.add_many(islice(events, restarted.offset, None))
+    for row in restarted.results():
+        print(row)
+    os.remove(checkpoint_path)
+
+
+if __name__ == "__main__":
+    events = [
+        {"customer_id": 1, "account_id": 10, "name": "Joseph", "date": "2020-10-01T10:00:00",
+         "transaction_type": "pix", "value": 100.0},
+        {"customer_id": 1, "account_id": 10, "name": "Joseph", "date": "2020-10-01T18:30:00",
+         "transaction_type": "pix", "value": 50.0},
+        {"customer_id": 1, "account_id": 10, "name": "Joseph", "date": "2020-10-01T19:00:00",
+         "transaction_type": "boleto", "value": 320.5},
+        {"customer_id": 2, "account_id": 20, "name": "Maria", "date": "2020-10-02T09:15:00",
+         "transaction_type": "p2p", "value": 25.0}
+    ]
+    main(events)
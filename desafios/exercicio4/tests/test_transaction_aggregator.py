@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import unittest
+
+from transaction_aggregator import TransactionAggregator
+
+
+class TestTransactionAggregator(unittest.TestCase):
+    events = [
+        {"customer_id": 1, "account_id": 10, "name": "Pedro", "date": "2020-10-01T10:00:00",
+         "transaction_type": "pix", "value": 100.0},
+        {"customer_id": 1, "account_id": 10, "name": "Pedro", "date": "2020-10-01T18:30:00",
+         "transaction_type": "pix", "value": 50.0},
+        {"customer_id": 1, "account_id": 10, "name": "Pedro", "date": "2020-10-02T09:00:00",
+         "transaction_type": "pix", "value": 10.0},
+        {"customer_id": 1, "account_id": 10, "name": "Pedro", "date": "2020-10-01T19:00:00",
+         "transaction_type": "boleto", "value": 320.5}
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint_path = os.path.join(self.directory.name, "aggregator.checkpoint")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_mean(self):
+        """
+        Adds events of the same customer, in different days and transaction types, checking that each key has its own
+        mean value.
+        """
+        aggregator = TransactionAggregator()
+        aggregator.add_many(self.events)
+        self.assertEqual(75.0, aggregator.mean(1, 10, "2020-10-01", "pix"))
+        self.assertEqual(10.0, aggregator.mean(1, 10, "2020-10-02", "pix"))
+        self.assertEqual(320.5, aggregator.mean(1, 10, "2020-10-01", "boleto"))
+        self.assertIsNone(aggregator.mean(1, 10, "2020-10-01", "p2p"))
+
+    def test_unknown_transaction_type(self):
+        """
+        Adds an event with an transaction type that isn't aggregated, which must raise an ValueError.
+        """
+        with self.assertRaises(ValueError):
+            TransactionAggregator().add({**self.events[0], "transaction_type": "ted"})
+
+    def test_invalid_value(self):
+        """
+        Adds an event whose value isn't a number, which must raise an ValueError without creating the key of the event.
+        """
+        aggregator = TransactionAggregator()
+        with self.assertRaises(ValueError):
+            aggregator.add({**self.events[0], "value": "abc"})
+        with self.assertRaises(ValueError):
+            aggregator.add({**self.events[0], "value": None})
+        self.assertIsNone(aggregator.mean(1, 10, "2020-10-01", "pix"))
+        self.assertEqual([], aggregator.results())
+        self.assertEqual(2, aggregator.offset)
+        aggregator.add({**self.events[0], "value": "20.5"})
+        self.assertEqual(20.5, aggregator.mean(1, 10, "2020-10-01", "pix"))
+
+    def test_emit(self):
+        """
+        Emits rows twice, checking that the second emit only has the rows changed after the first one.
+        """
+        aggregator = TransactionAggregator()
+        aggregator.add_many(self.events)
+        self.assertEqual(3, len(aggregator.emit()))
+        aggregator.add({**self.events[0], "value": 150.0})
+        expected_rows = [{"customer_id": 1, "account_id": 10, "name": "Pedro", "date": "2020-10-01",
+                          "transaction_type": "pix", "mean_value": 100.0}]
+        self.assertEqual(expected_rows, aggregator.emit())
+        self.assertEqual([], aggregator.emit())
+        self.assertEqual(3, len(aggregator.results()))
+
+    def test_restore_from_checkpoint(self):
+        """
+        Adds events with an checkpoint after every 2 events, and creates an new aggregator with the same checkpoint,
+        which must continue from the state saved.
+        """
+        aggregator = TransactionAggregator(self.checkpoint_path, checkpoint_every=2)
+        aggregator.add_many(self.events[:3])
+        restarted = TransactionAggregator(self.checkpoint_path)
+        self.assertEqual(75.0, restarted.mean(1, 10, "2020-10-01", "pix"))
+        self.assertIsNone(restarted.mean(1, 10, "2020-10-02", "pix"))
+        restarted.add(self.events[0])
+        self.assertEqual(250.0 / 3, restarted.mean(1, 10, "2020-10-01", "pix"))
+        self.assertFalse(os.path.exists(f"{self.checkpoint_path}.tmp"))
+
+    def test_resume_from_offset(self):
+        """
+        Stops the aggregation after an event that isn't on the checkpoint, and restarts it reading the events from the
+        offset saved, which must aggregate each event once.
+        """
+        aggregator = TransactionAggregator(self.checkpoint_path, checkpoint_every=2)
+        aggregator.add_many(self.events[:3])
+        restarted = TransactionAggregator(self.checkpoint_path, checkpoint_every=2)
+        self.assertEqual(2, restarted.offset)
+        restarted.add_many(self.events[restarted.offset:])
+        self.assertEqual(4, restarted.offset)
+        self.assertEqual(75.0, restarted.mean(1, 10, "2020-10-01", "pix"))
+        self.assertEqual(10.0, restarted.mean(1, 10, "2020-10-02", "pix"))
+        self.assertEqual(320.5, restarted.mean(1, 10, "2020-10-01", "boleto"))
+
+    def test_resume_after_rejected_event(self):
+        """
+        Consumes an rejected event before the checkpoint, and restarts the aggregation from the offset saved, which
+        must count the rejected event, so no event is aggregated twice. The checkpoint must be an JSON file.
+        """
+        events = [{**self.events[0], "transaction_type": "ted"}] + [{**self.events[0], "value": value}
+                                                                     for value in (10.0, 20.0, 30.0)]
+        aggregator = TransactionAggregator(self.checkpoint_path, checkpoint_every=2)
+        for event in events[:3]:
+            try:
+                aggregator.add(event)
+            except ValueError:
+                pass
+        restarted = TransactionAggregator(self.checkpoint_path, checkpoint_every=2)
+        self.assertEqual(2, restarted.offset)
+        restarted.add_many(events[restarted.offset:])
+        self.assertEqual(20.0, restarted.mean(1, 10, "2020-10-01", "pix"))
+        self.assertEqual(3, restarted.counts[restarted.slots[(1, 10, "2020-10-01", "pix")]])
+        with open(self.checkpoint_path) as file:
+            self.assertEqual(4, json.load(file)["offset"])
+
+
+if __name__ == '__main__':
+    # begin the unittest.main()
+    unittest.main()
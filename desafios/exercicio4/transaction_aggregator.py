@@ -0,0 +1,147 @@
+import json
+import os
+from array import array
+
+
+class TransactionAggregator:
+    def __init__(self, checkpoint_path: str = None, checkpoint_every: int = 1000,
+                 transaction_types: tuple = ("pix", "p2p", "boleto")):
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.transaction_types = transaction_types
+        # each (customer_id, account_id, date, transaction_type) key has a slot, that is its index on sums and counts.
+        # Sums and counts are kept in arrays, so each key costs only one float and one integer besides the key itself
+        self.slots = {}
+        self.keys = []
+        self.sums = array("d")
+        self.counts = array("q")
+        self.names = {}
+        # slots changed since last emit
+        self.changed = set()
+        # number of events consumed since the aggregation started, including the rejected ones. It is saved with the
+        # checkpoint, so after a restart the consumer skips the events already consumed and reads the source again from
+        # this offset
+        self.offset = 0
+        self.pending = 0
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self._restore()
+
+    def _key(self, event: dict) -> tuple:
+        """Create the aggregation key of an transaction event. Date is the first 10 characters of event date, so
+        timestamps like '2020-10-01T10:30:00' are aggregated by day. If transaction type isn't one of the types
+        aggregated, an Value Error Exception is raised.
+            :param event: dict with the transaction event
+            :return: tuple with customer_id, account_id, date and transaction_type
+        """
+        if event["transaction_type"] not in self.transaction_types:
+            raise ValueError(f"Transaction type must be one of {self.transaction_types},"
+                             f" received '{event['transaction_type']}'")
+        return event["customer_id"], event["account_id"], str(event["date"])[:10], event["transaction_type"]
+
+    def add(self, event: dict):
+        """Add an transaction event value to the running sum and count of its key. After checkpoint_every events, the
+        state is saved on checkpoint_path. If value isn't a number, an Value Error Exception is raised and the event
+        isn't added, but it is still consumed, so offset keeps the position of the next event of the source.
+            :param event: dict with the transaction event
+        """
+        self.offset += 1
+        self.pending += 1
+        try:
+            key = self._key(event)
+            try:
+                value = float(event["value"])
+            except (TypeError, ValueError):
+                raise ValueError(f"Transaction value must be a number, received '{event['value']}'") from None
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = self.slots[key] = len(self.keys)
+                self.keys.append(key)
+                self.sums.append(0.0)
+                self.counts.append(0)
+            self.sums[slot] += value
+            self.counts[slot] += 1
+            if "name" in event:
+                self.names[key[0]] = event["name"]
+            self.changed.add(slot)
+        finally:
+            if self.checkpoint_path and self.pending >= self.checkpoint_every:
+                self.checkpoint()
+
+    def add_many(self, events):
+        """Add each event of an iterable of transaction events. When the aggregator was restored from an checkpoint,
+        events must be read from offset, since the events before it are already aggregated.
+            :param events: iterable of dicts with transaction events
+        """
+        for event in events:
+            self.add(event)
+
+    def mean(self, customer_id, account_id, date: str, transaction_type: str) -> float:
+        """Return the mean transaction value of an key, or None if no transaction was added for it.
+            :return: float with mean transaction value
+        """
+        slot = self.slots.get((customer_id, account_id, date, transaction_type))
+        return None if slot is None else self.sums[slot] / self.counts[slot]
+
+    def _row(self, slot: int) -> dict:
+        """Create the result row of an slot, with the same columns of the mean transaction value query.
+            :param slot: index of the key on sums and counts
+            :return: dict with customer_id, account_id, name, date, transaction_type and mean_value
+        """
+        customer_id, account_id, date, transaction_type = self.keys[slot]
+        return {
+            "customer_id": customer_id,
+            "account_id": account_id,
+            "name": self.names.get(customer_id),
+            "date": date,
+            "transaction_type": transaction_type,
+            "mean_value": self.sums[slot] / self.counts[slot]
+        }
+
+    def emit(self) -> list:
+        """Return the rows whose mean changed since last emit, so only these rows need to be updated by consumers.
+            :return: list of dicts with result rows
+        """
+        rows = [self._row(slot) for slot in sorted(self.changed)]
+        self.changed.clear()
+        return rows
+
+    def results(self) -> list:
+        """Return the rows of all keys aggregated.
+            :return: list of dicts with result rows
+        """
+        return [self._row(slot) for slot in range(len(self.keys))]
+
+    def checkpoint(self, path: str = None):
+        """Save the aggregation state and the offset of the next event on disk. State is written to a temporary file
+        that replaces the checkpoint, so an failure while writing never leaves a broken checkpoint. State is saved as
+        JSON, so loading a checkpoint never executes code. Keys are saved as lists and names as pairs, since JSON
+        objects only have string keys.
+            :param path: string with the checkpoint path, checkpoint_path if not informed
+        """
+        path = path or self.checkpoint_path
+        state = {
+            "offset": self.offset,
+            "keys": self.keys,
+            "sums": self.sums.tolist(),
+            "counts": self.counts.tolist(),
+            "names": list(self.names.items()),
+            "changed": sorted(self.changed)
+        }
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(state, file)
+        os.replace(f"{path}.tmp", path)
+        self.pending = 0
+
+    def _restore(self):
+        """Load the aggregation state saved on checkpoint_path, so the aggregation continues from the last checkpoint.
+        Events added after the last checkpoint are lost, and are added again when the source is read from offset.
+        """
+        with open(self.checkpoint_path) as file:
+            state = json.load(file)
+        self.offset = state["offset"]
+        self.keys = [tuple(key) for key in state["keys"]]
+        self.sums = array("d", state["sums"])
+        self.counts = array("q", state["counts"])
+        self.names = dict(state["names"])
+        self.changed = set(state["changed"])
+        self.slots = {key: slot for slot, key in enumerate(self.keys)}
@@ -0,0 +1,81 @@
+import importlib.util
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from star_schema_loader import StarSchemaLoader, connect
+
+EVENTS = 20000
+BATCH_SIZE = 1000
+
+
+def generate_events(quantity):
+    '''
+    Gera eventos de transação com clientes, contas, datas e tipos de transação repetidos
+    :param quantity: Quantidade de eventos (int)
+    :return: Eventos (generator)
+    '''
+    transaction_types = ("pix", "p2p", "boleto")
+    for i in range(quantity):
+        yield {
+            "eid": f"movement-{i}",
+            "customer_id": i % 500,
+            "account_id": i % 700,
+            "name": f"Customer {i % 500}",
+            "document_number": f"{i % 500:011d}",
+            "date": f"2020-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00",
+            "transaction_type": transaction_types[i % 3],
+            "value": float(i % 1000)
+        }
+
+
+class RowAtATimeLoader(StarSchemaLoader):
+    def _insert(self, table: str, rows: list, conflict: str = "") -> int:
+        '''
+        Insere cada linha com um INSERT ... VALUES parametrizado, sem os INSERTs de várias linhas nem o CSV temporário
+        :param table: Nome da tabela e, opcionalmente, suas colunas (str)
+        :param rows: Linhas da tabela (list)
+        :param conflict: Cláusula ON CONFLICT (str)
+        :return: Quantidade de linhas inseridas (int)
+        '''
+        inserted = 0
+        for row in rows:
+            result = self.connection.execute(f"INSERT INTO {table} VALUES ({', '.join('?' * len(row))}) {conflict}",
+                                             row)
+            inserted += result.rowcount if isinstance(self.connection, sqlite3.Connection) else result.fetchone()[0]
+        return inserted
+
+
+def measure(engine, loader_class, batch_size, quantity):
+    '''
+    Carrega os eventos em um banco novo, em disco, para que cada commit tenha o custo real
+    :param engine: Banco de dados, 'sqlite' ou 'duckdb' (str)
+    :param loader_class: Classe do loader, StarSchemaLoader ou RowAtATimeLoader (type)
+    :param batch_size: Quantidade de eventos por lote e por commit (int)
+    :param quantity: Quantidade de eventos (int)
+    :return: Linhas carregadas por segundo (float)
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        connection = connect(os.path.join(directory, f"dw.{engine}"), engine)
+        loader = loader_class(connection)
+        start = time.perf_counter()
+        loaded = loader.load(generate_events(quantity), batch_size)
+        elapsed = time.perf_counter() - start
+        connection.close()
+    return loaded / elapsed
+
+
+def main(quantity):
+    engines = ["sqlite"] + (["duckdb"] if importlib.util.find_spec("duckdb") else [])
+    print(f"{'engine':<8}{'mode':<14}{'rows/sec':>12}")
+    for engine in engines:
+        # row at a time inserts and commits each event alone, so it loads only a tenth of the events
+        for mode, loader_class, batch_size, events in (("row-at-a-time", RowAtATimeLoader, 1, quantity // 10),
+                                                       ("bulk", StarSchemaLoader, BATCH_SIZE, quantity)):
+            print(f"{engine:<8}{mode:<14}{measure(engine, loader_class, batch_size, events):>12.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else EVENTS)
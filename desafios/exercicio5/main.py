@@ -0,0 +1,30 @@
+from star_schema_loader import StarSchemaLoader, connect
+
+
+def main(events):
+    connection = connect()
+    loader = StarSchemaLoader(connection)
+    print(f"Loaded movements: {loader.load(events)}")
+    query = """
+        SELECT c.customer_id, c.name, d.full_date, t.transaction_type, AVG(f.value) AS mean_value
+        FROM fact_movement f
+        JOIN dim_customer c ON c.customer_key = f.customer_key
+        JOIN dim_date d ON d.date_key = f.date_key
+        JOIN dim_transaction_type t ON t.transaction_type_key = f.transaction_type_key
+        GROUP BY c.customer_id, c.name, d.full_date, t.transaction_type
+    """
+    for row in connection.execute(query).fetchall():
+        print(row)
+
+
+if __name__ == "__main__":
+    events = [
+        {"eid": "3e628a05-7a4a-4bf3-8770-084c11601a12", "customer_id": 1, "account_id": 10, "name": "Joseph",
+         "document_number": "42323235600", "date": "2020-10-01T10:00:00", "transaction_type": "pix", "value": 100.0},
+        {"eid": "9b1deb4d-3b7d-4bad-9bdd-2b0d7b3dcb6d", "customer_id": 1, "account_id": 10, "name": "Joseph",
+         "document_number": "42323235600", "date": "2020-10-01T18:30:00", "transaction_type": "pix", "value": 50.0},
+        {"eid": "1b9d6bcd-bbfd-4b2d-9b5d-ab8dfbbd4bed", "customer_id": 2, "account_id": 20, "name": "Maria",
+         "document_number": "12345678900", "date": "2020-10-02T09:15:00", "transaction_type": "boleto",
+         "value": 320.5}
+    ]
+    main(events)
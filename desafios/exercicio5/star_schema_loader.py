@@ -0,0 +1,206 @@
+import csv
+import os
+import sqlite3
+import tempfile
+from datetime import date
+
+TABLES = (
+    """CREATE TABLE IF NOT EXISTS dim_customer (
+        customer_key INTEGER PRIMARY KEY,
+        customer_id VARCHAR NOT NULL UNIQUE,
+        name VARCHAR,
+        document_number VARCHAR
+    )""",
+    """CREATE TABLE IF NOT EXISTS dim_account (
+        account_key INTEGER PRIMARY KEY,
+        account_id VARCHAR NOT NULL UNIQUE,
+        customer_key INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS dim_date (
+        date_key INTEGER PRIMARY KEY,
+        full_date DATE NOT NULL,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        weekday INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS dim_transaction_type (
+        transaction_type_key INTEGER PRIMARY KEY,
+        transaction_type VARCHAR NOT NULL UNIQUE
+    )""",
+    """CREATE TABLE IF NOT EXISTS fact_movement (
+        movement_id VARCHAR PRIMARY KEY,
+        date_key INTEGER NOT NULL,
+        customer_key INTEGER NOT NULL,
+        account_key INTEGER NOT NULL,
+        transaction_type_key INTEGER NOT NULL,
+        value DOUBLE NOT NULL
+    )"""
+)
+
+# customer attributes, in the same order of dim_customer columns
+CUSTOMER_ATTRIBUTES = ("name", "document_number")
+# rows inserted by each SQLite INSERT statement. Each row is a group of parameters, so it must keep rows * columns below
+# the SQLite limit of 32766 parameters
+INSERT_ROWS = 500
+
+
+def connect(database: str = ":memory:", engine: str = "sqlite"):
+    """Open an connection with the DW database. DuckDB is an optional dependency, so it is only imported when used.
+        :param database: string with database path, in memory database if not informed
+        :param engine: string with database engine, 'sqlite' or 'duckdb'
+        :return: sqlite3 or duckdb connection
+    """
+    if engine == "sqlite":
+        return sqlite3.connect(database)
+    if engine == "duckdb":
+        import duckdb
+        return duckdb.connect(database)
+    raise ValueError(f"Engine must be 'sqlite' or 'duckdb', received '{engine}'")
+
+
+class DimensionCache:
+    def __init__(self, rows: list):
+        # surrogate keys by natural key (as string), so events never need to query the dimension
+        self.keys = {str(natural_key): key for natural_key, key in rows}
+        self.last_key = max(self.keys.values(), default=0)
+        self.new_rows = []
+
+    def key(self, natural_key: str, row) -> int:
+        """Return the surrogate key of an natural key. If natural key is new, the next key is created and the
+        dimension row is kept on new_rows, to be inserted with the rest of the batch.
+            :param natural_key: string with natural key
+            :param row: function that creates the dimension row from the surrogate key
+            :return: integer with surrogate key
+        """
+        key = self.keys.get(natural_key)
+        if key is None:
+            self.last_key += 1
+            key = self.keys[natural_key] = self.last_key
+            self.new_rows.append(row(key))
+        return key
+
+    def pop_new_rows(self) -> list:
+        """Return the rows created since last call, that must be inserted on the dimension.
+            :return: list of tuples with dimension rows
+        """
+        rows, self.new_rows = self.new_rows, []
+        return rows
+
+
+class StarSchemaLoader:
+    def __init__(self, connection):
+        self.connection = connection
+        for table in TABLES:
+            connection.execute(table)
+        connection.commit()
+        self._load_caches()
+
+    def _fetch_all(self, query: str) -> list:
+        return self.connection.execute(query).fetchall()
+
+    def _insert(self, table: str, rows: list, conflict: str = "") -> int:
+        """Insert rows in bulk. On SQLite, rows are sent together in multi-row INSERT statements of INSERT_ROWS rows.
+        DuckDB binds each parameter slowly, so rows are written to a temporary CSV file that DuckDB reads in one
+        INSERT statement, casting its values to the column types. NULL values are written as \\N, so they aren't
+        read as empty strings and empty strings aren't read as NULL.
+            :param table: string with table name and, optionally, its columns
+            :param rows: list of tuples with rows, all with the same number of columns
+            :param conflict: string with ON CONFLICT clause
+            :return: integer with the number of rows changed, without the rows ignored by the ON CONFLICT clause
+        """
+        if not rows:
+            return 0
+        if isinstance(self.connection, sqlite3.Connection):
+            changed = 0
+            for start in range(0, len(rows), INSERT_ROWS):
+                chunk = rows[start:start + INSERT_ROWS]
+                row_params = f"({', '.join('?' * len(chunk[0]))})"
+                changed += self.connection.execute(f"INSERT INTO {table} VALUES"
+                                                   f" {', '.join([row_params] * len(chunk))} {conflict}",
+                                                   [value for row in chunk for value in row]).rowcount
+            return changed
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as file:
+            csv.writer(file).writerows([["\\N" if value is None else value for value in row] for row in rows])
+        try:
+            return self.connection.execute(f"INSERT INTO {table} SELECT * FROM read_csv(?, header = false,"
+                                           f" delim = ',', quote = '\"', nullstr = '\\N', all_varchar = true)"
+                                           f" {conflict}", [file.name]).fetchone()[0]
+        finally:
+            os.remove(file.name)
+
+    def _load_caches(self):
+        """Load surrogate keys of all dimensions, and the customer attributes last saved, so only customers whose data
+        changed are upserted.
+        """
+        self.customers = DimensionCache(self._fetch_all("SELECT customer_id, customer_key FROM dim_customer"))
+        self.accounts = DimensionCache(self._fetch_all("SELECT account_id, account_key FROM dim_account"))
+        self.dates = DimensionCache(self._fetch_all("SELECT full_date, date_key FROM dim_date"))
+        self.transaction_types = DimensionCache(self._fetch_all(
+            "SELECT transaction_type, transaction_type_key FROM dim_transaction_type"))
+        self.customer_attributes = {row[0]: tuple(row[1:]) for row in self._fetch_all(
+            "SELECT customer_key, name, document_number FROM dim_customer")}
+
+    def _load_batch(self, events: list) -> int:
+        """Load an batch of transaction events. New dimension rows and facts are inserted in bulk for each table,
+        customers whose data changed are upserted, and the batch is committed once. Customer attributes missing on an
+        event keep the value last saved. Movements already loaded are ignored, so an batch can be loaded again after a
+        failure, and if the batch fails, it is rolled back and caches are loaded again from the database.
+            :param events: list of dicts with transaction events
+            :return: integer with the number of movements inserted
+        """
+        customers, facts = {}, {}
+        # explicit transaction, since DuckDB commits each statement otherwise
+        self.connection.execute("BEGIN TRANSACTION")
+        try:
+            for event in events:
+                customer_id = str(event["customer_id"])
+                customer_key = self.customers.key(customer_id, lambda key: None)
+                saved = self.customer_attributes.get(customer_key, (None,) * len(CUSTOMER_ATTRIBUTES))
+                attributes = tuple(event[attribute] if attribute in event else value
+                                   for attribute, value in zip(CUSTOMER_ATTRIBUTES, saved))
+                if saved != attributes or customer_key not in self.customer_attributes:
+                    self.customer_attributes[customer_key] = attributes
+                    customers[customer_key] = (customer_key, customer_id) + attributes
+                account_id = str(event["account_id"])
+                account_key = self.accounts.key(account_id, lambda key: (key, account_id, customer_key))
+                day = date.fromisoformat(str(event["date"])[:10])
+                date_key = self.dates.key(day.isoformat(), lambda key: (key, day.isoformat(), day.year, day.month,
+                                                                        day.day, day.isoweekday()))
+                transaction_type = event["transaction_type"]
+                transaction_type_key = self.transaction_types.key(transaction_type,
+                                                                  lambda key: (key, transaction_type))
+                facts[event["eid"]] = (event["eid"], date_key, customer_key, account_key, transaction_type_key,
+                                       event["value"])
+            # new customers are also changed customers, so they are written by the upsert instead
+            self.customers.pop_new_rows()
+
+            self._insert("dim_customer (customer_key, customer_id, name, document_number)", list(customers.values()),
+                         "ON CONFLICT (customer_id) DO UPDATE"
+                         " SET name = excluded.name, document_number = excluded.document_number")
+            self._insert("dim_account", self.accounts.pop_new_rows())
+            self._insert("dim_date", self.dates.pop_new_rows())
+            self._insert("dim_transaction_type", self.transaction_types.pop_new_rows())
+            inserted = self._insert("fact_movement", list(facts.values()), "ON CONFLICT DO NOTHING")
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            self._load_caches()
+            raise
+        return inserted
+
+    def load(self, events, batch_size: int = 1000) -> int:
+        """Load transaction events into the star schema in batches. An batch_size of 1 loads one row at a time.
+            :param events: iterable of dicts with transaction events
+            :param batch_size: integer with the number of events loaded in each batch
+            :return: integer with the number of movements inserted, without the movements already loaded
+        """
+        loaded, batch = 0, []
+        for event in events:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                loaded += self._load_batch(batch)
+                batch = []
+        if batch:
+            loaded += self._load_batch(batch)
+        return loaded
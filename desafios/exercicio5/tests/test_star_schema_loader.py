@@ -0,0 +1,98 @@
+import importlib.util
+import unittest
+
+from star_schema_loader import StarSchemaLoader, connect
+
+
+class TestStarSchemaLoader(unittest.TestCase):
+    events = [
+        {"eid": "1", "customer_id": 1, "account_id": 10, "name": "Pedro", "document_number": "42323235600",
+         "date": "2020-10-01T10:00:00", "transaction_type": "pix", "value": 100.0},
+        {"eid": "2", "customer_id": 1, "account_id": 10, "name": "Pedro", "document_number": "42323235600",
+         "date": "2020-10-01T18:30:00", "transaction_type": "boleto", "value": 50.0},
+        {"eid": "3", "customer_id": 2, "account_id": 20, "name": "Maria", "document_number": "12345678900",
+         "date": "2020-10-02T09:00:00", "transaction_type": "p2p", "value": 25.0}
+    ]
+    engine = "sqlite"
+
+    def setUp(self):
+        self.connection = connect(engine=self.engine)
+        self.loader = StarSchemaLoader(self.connection)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def _fetch_all(self, query: str) -> list:
+        cursor = self.connection.cursor()
+        cursor.execute(query)
+        return cursor.fetchall()
+
+    def test_load(self):
+        """
+        Loads events in batches of 2, checking that each dimension has one row for each natural key and that facts
+        reference them.
+        """
+        self.assertEqual(3, self.loader.load(self.events, batch_size=2))
+        self.assertEqual([(1, "1", "Pedro"), (2, "2", "Maria")],
+                         self._fetch_all("SELECT customer_key, customer_id, name FROM dim_customer ORDER BY 1"))
+        self.assertEqual([(1, "10", 1), (2, "20", 2)], self._fetch_all("SELECT * FROM dim_account ORDER BY 1"))
+        self.assertEqual([(1, 2020, 10, 1), (2, 2020, 10, 2)],
+                         self._fetch_all("SELECT date_key, year, month, day FROM dim_date ORDER BY 1"))
+        self.assertEqual([(1, "pix"), (2, "boleto"), (3, "p2p")],
+                         self._fetch_all("SELECT * FROM dim_transaction_type ORDER BY 1"))
+        self.assertEqual([("1", 1, 1, 1, 1, 100.0), ("2", 1, 1, 1, 2, 50.0), ("3", 2, 2, 2, 3, 25.0)],
+                         self._fetch_all("SELECT * FROM fact_movement ORDER BY 1"))
+
+    def test_upsert_customer(self):
+        """
+        Loads an event of an customer that changed its name, which must update the customer row and keep its key.
+        """
+        self.loader.load(self.events)
+        self.loader.load([{**self.events[0], "eid": "4", "name": "Pedro Henrique"}])
+        self.assertEqual([(1, "Pedro Henrique"), (2, "Maria")],
+                         self._fetch_all("SELECT customer_key, name FROM dim_customer ORDER BY 1"))
+
+    def test_missing_customer_attributes(self):
+        """
+        Loads events without the customer name, which must keep the name saved, and an empty document number, which
+        must be saved as an empty string instead of NULL.
+        """
+        self.loader.load(self.events)
+        event = {key: value for key, value in self.events[0].items() if key != "name"}
+        self.loader.load([{**event, "eid": "4", "document_number": ""}])
+        self.loader.load([{**self.events[2], "eid": "5", "customer_id": 3, "name": None}])
+        self.assertEqual([(1, "Pedro", ""), (2, "Maria", "12345678900"), (3, None, "12345678900")],
+                         self._fetch_all("SELECT customer_key, name, document_number FROM dim_customer ORDER BY 1"))
+
+    def test_load_again(self):
+        """
+        Loads the same events twice, and with a new loader that must read keys from the database, checking that
+        movements and dimensions aren't duplicated.
+        """
+        self.assertEqual(3, self.loader.load(self.events))
+        self.assertEqual(0, self.loader.load(self.events, batch_size=1))
+        self.assertEqual(1, StarSchemaLoader(self.connection).load(
+            self.events + [{**self.events[0], "eid": "4", "account_id": 11}]))
+        self.assertEqual([(4,)], self._fetch_all("SELECT COUNT(*) FROM fact_movement"))
+        self.assertEqual([(3, "11")], self._fetch_all("SELECT account_key, account_id FROM dim_account"
+                                                      " WHERE account_id = '11'"))
+
+    def test_failed_batch(self):
+        """
+        Loads an batch with an invalid event, which must be rolled back, and then loads valid events.
+        """
+        with self.assertRaises(KeyError):
+            self.loader.load(self.events + [{"eid": "4"}])
+        self.assertEqual([(0,)], self._fetch_all("SELECT COUNT(*) FROM dim_customer"))
+        self.assertEqual(3, self.loader.load(self.events))
+        self.assertEqual([(3,)], self._fetch_all("SELECT COUNT(*) FROM fact_movement"))
+
+
+@unittest.skipUnless(importlib.util.find_spec("duckdb"), "duckdb is not installed")
+class TestStarSchemaLoaderDuckDB(TestStarSchemaLoader):
+    engine = "duckdb"
+
+
+if __name__ == '__main__':
+    # begin the unittest.main()
+    unittest.main()